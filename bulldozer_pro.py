@@ -1,15 +1,21 @@
 import os
+import re
 import sys
+import queue
+import random
 import time
+import logging
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
-from selenium.webdriver.common.keys import Keys
+from selenium.common.exceptions import TimeoutException, StaleElementReferenceException
 
 # ==================================================
 # CONFIG
@@ -18,8 +24,35 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 CHECK_URL = "https://ipc.gov.cz/en/status-of-your-application/"
 APPLICATION_ID_FIELD = "id"
-DELAY_BETWEEN_CHECKS = 1.5
+SUBMIT_BUTTON_XPATH = "//button[@type='submit' and contains(@class,'button__primary')]"
+REFUSE_COOKIES_XPATH = "//button[contains(text(),'Refuse all')]"
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.webp", "*.ico",
+    "*.woff", "*.woff2", "*.ttf",
+    "*google-analytics*", "*googletagmanager*"
+]
+# Native setter + input event: değer tek çağrıda yazılır, form framework'ü de görür
+SET_INPUT_VALUE_JS = (
+    "const setter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;"
+    "setter.call(arguments[0], arguments[1]);"
+    "arguments[0].dispatchEvent(new Event('input', {bubbles: true}));"
+    "arguments[0].dispatchEvent(new Event('change', {bubbles: true}));"
+)
+GET_ALERT_TEXT_JS = "const el = document.querySelector('div.alert__content'); return el ? el.innerText : null;"
+DELAY_BETWEEN_CHECKS = 0.5  # base spacing between check starts (all workers combined)
+MAX_DELAY_BETWEEN_CHECKS = 30  # backoff cap while the site is failing
+CHECK_JITTER = 0.25  # random extra spacing so workers don't fire in lockstep
+LIMITER_RECOVER_AFTER = 5  # successes in a row before the spacing is halved again
 MAX_NOT_FOUND_CONSECUTIVE = 8
+PROBE_TAIL_MISSES = 3  # consecutive misses allowed past the busiest same-weekday day seen
+CITY_CIRCUIT_FAILED_DAYS = 4  # failed days in a row (no finds, mostly errors) before a city's older days are skipped
+CITY_CIRCUIT_ERROR_RATIO = 0.5  # share of a day's probes that must end in ERROR/UNKNOWN for the day to count as failed
+CHECK_WORKERS = 2  # parallel headless Chrome instances (default; override with the CHECK_WORKERS env var)
+EXISTS_BATCH_SIZE = 50  # candidate IDs per bulk lookup when prefetch is unavailable
+PART1_PAGE_SIZE = 100  # BEING_PROCESSED rows fetched per Supabase page
+PART1_RECHECK_HOURS = 5  # skip rows checked more recently; keep a bit under the cron interval (6h) so no run is skipped
+WRITE_BATCH_SIZE = 25  # buffered rows before a bulk insert is sent
+WRITE_FLUSH_INTERVAL = 2  # seconds of queue idle time before a partial batch is sent
 DEBUG_MODE = True 
 
 # Retry config for Supabase API calls
@@ -27,6 +60,48 @@ MAX_API_RETRIES = 3
 API_RETRY_DELAY = 5  # seconds between retries
 RETRYABLE_STATUS_CODES = {502, 503, 504, 429}
 
+# Supabase headers, built once
+HEADERS = {
+    "apikey": SUPABASE_KEY,
+    "Authorization": f"Bearer {SUPABASE_KEY}",
+    "Content-Type": "application/json",
+    "Prefer": "return=minimal"
+}
+HEADERS_INSERT = {**HEADERS, "Prefer": "return=representation"}
+HEADERS_UPSERT = {**HEADERS, "Prefer": "resolution=merge-duplicates,return=minimal"}
+HEADERS_COUNT = {**HEADERS, "Prefer": "count=exact"}
+
+# One HTTP session per thread: keep-alive connections are reused across Supabase calls
+# (requests.Session is not guaranteed thread-safe; main, workers and the db writer all call Supabase)
+_thread_local = threading.local()
+
+def get_session():
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0))
+        _thread_local.session = session
+    return session
+
+# Status page phrases → status, in priority order
+STATUS_PHRASES = [
+    ("preliminarily assessed positively", "APPROVED"),
+    ("was rejected", "REJECTED"),
+    ("being processed", "BEING_PROCESSED"),
+    ("not found", "NOT_FOUND"),
+    ("no application", "NOT_FOUND"),
+]
+STATUS_RE = re.compile("|".join(re.escape(phrase) for phrase, _ in STATUS_PHRASES), re.IGNORECASE)
+STATUS_MAP = dict(STATUS_PHRASES)
+STATUS_PRIORITY = ["APPROVED", "REJECTED", "BEING_PROCESSED", "NOT_FOUND"]
+STATUS_DEBUG_LABELS = {
+    "APPROVED": ("Approved!", "SUCCESS"),
+    "REJECTED": ("Rejected", "ERROR"),
+    "BEING_PROCESSED": ("Being Processed", "WARNING"),
+    "NOT_FOUND": ("Not Found", "DIM"),
+    "UNKNOWN": ("Unknown", "DEBUG"),
+}
+
 # Stats
 stats = {
     "checked": 0,
@@ -36,24 +111,77 @@ stats = {
     "errors": 0,
     "api_retries": 0
 }
+stats_lock = threading.Lock()
+
+def incr_stat(key):
+    with stats_lock:
+        stats[key] += 1
 
 # ==================================================
 # LOGGING
 # ==================================================
-def log(message, level="INFO"):
-    timestamp = datetime.now(timezone.utc).strftime("%H:%M:%S")
-    prefix = {
-        "INFO": "ℹ️",
-        "SUCCESS": "✅",
-        "ERROR": "❌",
-        "WARNING": "⚠️",
-        "DEBUG": "🔍",
-        "HIGHLIGHT": "📍",
-        "DIM": "•"
-    }.get(level, "•")
-    
-    print(f"[{timestamp}] {prefix} {message}")
-    sys.stdout.flush()
+LOG_FLUSH_INTERVAL = 1.0  # seconds; stdout is flushed at most this often (and on warnings/errors)
+
+# log() seviyeleri -> (logging seviyesi, satır öneki)
+LOG_LEVELS = {
+    "INFO": (logging.INFO, "ℹ️"),
+    "SUCCESS": (logging.INFO, "✅"),
+    "ERROR": (logging.ERROR, "❌"),
+    "WARNING": (logging.WARNING, "⚠️"),
+    "DEBUG": (logging.DEBUG, "🔍"),
+    "HIGHLIGHT": (logging.INFO, "📍"),
+    "DIM": (logging.INFO, "•")
+}
+
+class ThrottledStreamHandler(logging.StreamHandler):
+    """
+    Her satırda değil, en fazla LOG_FLUSH_INTERVAL'de bir (ve uyarı/hatada hemen) flush eder.
+    Arka plan thread'i de aynı aralıkla flush eder; sessiz bekleme anlarında son satırlar tamponda kalmaz.
+    """
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self.last_flush = 0.0
+        threading.Thread(target=self._flush_loop, name="log-flusher", daemon=True).start()
+    
+    def _flush_loop(self):
+        while True:
+            time.sleep(LOG_FLUSH_INTERVAL)
+            self.flush_now()
+    
+    def flush_now(self):
+        super().flush()
+        self.last_flush = time.monotonic()
+    
+    def flush(self):
+        if time.monotonic() - self.last_flush >= LOG_FLUSH_INTERVAL:
+            self.flush_now()
+    
+    def emit(self, record):
+        super().emit(record)
+        if record.levelno >= logging.WARNING:
+            self.flush_now()
+
+def setup_logging():
+    handler = ThrottledStreamHandler(sys.stdout)
+    formatter = logging.Formatter("[%(asctime)s] %(prefix)s %(message)s", datefmt="%H:%M:%S")
+    formatter.converter = time.gmtime
+    handler.setFormatter(formatter)
+    logger = logging.getLogger("bulldozer_pro")
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG if DEBUG_MODE else logging.INFO)
+    logger.propagate = False
+    return logger
+
+logger = setup_logging()
+
+def flush_log():
+    for handler in logger.handlers:
+        handler.flush_now()
+
+def log(message, level="INFO", *args):
+    """message %-biçiminde args alabilir; satır filtrelenirse hiç biçimlenmez"""
+    levelno, prefix = LOG_LEVELS.get(level, (logging.INFO, "•"))
+    logger.log(levelno, message, *args, extra={"prefix": prefix})
 
 # ==================================================
 # RETRY WRAPPER FOR SUPABASE API CALLS
@@ -68,17 +196,17 @@ def supabase_request_with_retry(method, url, max_retries=MAX_API_RETRIES, **kwar
     for attempt in range(max_retries):
         try:
             if method == "GET":
-                r = requests.get(url, **kwargs)
+                r = get_session().get(url, **kwargs)
             elif method == "POST":
-                r = requests.post(url, **kwargs)
+                r = get_session().post(url, **kwargs)
             elif method == "PATCH":
-                r = requests.patch(url, **kwargs)
+                r = get_session().patch(url, **kwargs)
             else:
                 raise ValueError(f"Unsupported method: {method}")
             
             # If status code is retryable, retry
             if r.status_code in RETRYABLE_STATUS_CODES:
-                stats["api_retries"] += 1
+                incr_stat("api_retries")
                 wait_time = API_RETRY_DELAY * (attempt + 1)  # exponential-ish backoff
                 log(f"   🔄 Supabase {r.status_code} error, retrying in {wait_time}s... (attempt {attempt + 1}/{max_retries})", "WARNING")
                 time.sleep(wait_time)
@@ -89,7 +217,7 @@ def supabase_request_with_retry(method, url, max_retries=MAX_API_RETRIES, **kwar
             return r
             
         except requests.exceptions.ConnectionError as e:
-            stats["api_retries"] += 1
+            incr_stat("api_retries")
             last_exception = e
             wait_time = API_RETRY_DELAY * (attempt + 1)
             log(f"   🔄 Connection error, retrying in {wait_time}s... (attempt {attempt + 1}/{max_retries})", "WARNING")
@@ -98,7 +226,7 @@ def supabase_request_with_retry(method, url, max_retries=MAX_API_RETRIES, **kwar
             # Non-retryable HTTP errors — raise immediately
             raise
         except requests.exceptions.Timeout as e:
-            stats["api_retries"] += 1
+            incr_stat("api_retries")
             last_exception = e
             wait_time = API_RETRY_DELAY * (attempt + 1)
             log(f"   🔄 Timeout, retrying in {wait_time}s... (attempt {attempt + 1}/{max_retries})", "WARNING")
@@ -112,51 +240,242 @@ def supabase_request_with_retry(method, url, max_retries=MAX_API_RETRIES, **kwar
 # ==================================================
 # SUPABASE HELPERS (with retry)
 # ==================================================
-def get_headers():
-    return {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json",
-        "Prefer": "return=minimal"
-    }
-
-def supabase_select(table, filters=None):
+def supabase_select(table, filters=None, columns="*", limit=None, offset=None):
     url = f"{SUPABASE_URL}/rest/v1/{table}"
-    params = {"select": "*"}
+    params = {"select": columns}
     if filters:
         params.update(filters)
-    r = supabase_request_with_retry("GET", url, headers=get_headers(), params=params, timeout=30)
+    if limit is not None:
+        params["limit"] = str(limit)
+    if offset is not None:
+        params["offset"] = str(offset)
+    r = supabase_request_with_retry("GET", url, headers=HEADERS, params=params, timeout=30)
     return r.json()
 
+def supabase_select_all(table, filters=None, columns="*", *, order, page_size=1000):
+    """
+    Sonuçları limit/offset ile sayfa sayfa çek; büyük tablolarda tek dev JSON yerine.
+    order zorunlu: sırasız sorguda sayfalar arasında satır atlanabilir veya tekrar gelebilir.
+    """
+    filters = {**(filters or {}), "order": order}
+    rows = []
+    offset = 0
+    while True:
+        page = supabase_select(table, filters, columns=columns, limit=page_size, offset=offset)
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        offset += page_size
+
+def supabase_count(table, filters=None):
+    """Prefer: count=exact ile satır sayısı (Content-Range başlığından)"""
+    url = f"{SUPABASE_URL}/rest/v1/{table}"
+    params = {"select": APPLICATION_ID_FIELD, "limit": "1"}
+    if filters:
+        params.update(filters)
+    r = supabase_request_with_retry("GET", url, headers=HEADERS_COUNT, params=params, timeout=30)
+    return int(r.headers["Content-Range"].split("/")[-1])
+
 def supabase_update(table, data, match_column, match_value):
     url = f"{SUPABASE_URL}/rest/v1/{table}"
     params = {match_column: f"eq.{match_value}"}
-    supabase_request_with_retry("PATCH", url, headers=get_headers(), json=data, params=params, timeout=30)
+    supabase_request_with_retry("PATCH", url, headers=HEADERS, json=data, params=params, timeout=30)
+
+def supabase_update_in(table, data, match_column, match_values):
+    """Aynı veriyi birden çok satıra tek PATCH ile yaz (match_column=in.(...))"""
+    url = f"{SUPABASE_URL}/rest/v1/{table}"
+    params = {match_column: f"in.({','.join(match_values)})"}
+    supabase_request_with_retry("PATCH", url, headers=HEADERS, json=data, params=params, timeout=30)
+
+def supabase_upsert(table, data, on_conflict):
+    url = f"{SUPABASE_URL}/rest/v1/{table}"
+    params = {"on_conflict": on_conflict}
+    supabase_request_with_retry("POST", url, headers=HEADERS_UPSERT, json=data, params=params, timeout=30)
 
 def supabase_insert(table, data):
     try:
         url = f"{SUPABASE_URL}/rest/v1/{table}"
-        headers = get_headers()
-        headers["Prefer"] = "return=representation"
-        r = supabase_request_with_retry("POST", url, headers=headers, json=data, timeout=30)
+        r = supabase_request_with_retry("POST", url, headers=HEADERS_INSERT, json=data, timeout=30)
         return True
     except Exception as e:
         log(f"Insert exception ({table}): {e}", "ERROR")
-        stats["errors"] += 1
+        incr_stat("errors")
         return False
 
-def application_exists(application_id):
+def bulk_exists(application_ids):
+    """
+    Verilen ID listesinden veritabanında olanları tek sorguda döndür (id=in.(...)).
+    """
+    try:
+        result = supabase_select("applications", {
+            APPLICATION_ID_FIELD: f"in.({','.join(application_ids)})"
+        }, columns="id")
+        return {row[APPLICATION_ID_FIELD] for row in result}
+    except Exception as e:
+        log(f"DB error for {application_ids[0]}..{application_ids[-1]}: {e}", "ERROR")
+        incr_stat("errors")
+        return set()
+
+def fetch_known_applications(city, start_date, end_date):
+    """
+    Tarama aralığındaki kayıtlı başvuruları tek seferde çek: {id: status} (sayfalı).
+    Part 2'de her aday ID için ayrı GET atmak yerine dict üzerinden kontrol edilir.
+    """
+    rows = supabase_select_all("applications", {
+        APPLICATION_ID_FIELD: f"like.{city}*",
+        "and": f"(submit_date.gte.{start_date.isoformat()},submit_date.lte.{end_date.isoformat()})"
+    }, columns="id,status", order="id.asc")
+    return {row[APPLICATION_ID_FIELD]: row["status"] for row in rows}
+
+def being_processed_filters(checked_before):
+    """last_checked'i checked_before'dan eski (veya hiç kontrol edilmemiş) BEING_PROCESSED kayıtları"""
+    cutoff = checked_before.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return {
+        "status": "eq.BEING_PROCESSED",
+        "or": f"(last_checked.is.null,last_checked.lt.{cutoff})"
+    }
+
+def fetch_being_processed_page(checked_before, after_id=None, page_size=PART1_PAGE_SIZE):
+    """
+    Yeniden kontrol zamanı gelmiş BEING_PROCESSED kayıtlarının bir sayfası (id sırasıyla, keyset pagination).
+    Sadece Part 1'in ihtiyaç duyduğu id ve status kolonları çekilir.
+    """
+    filters = being_processed_filters(checked_before)
+    filters["order"] = "id.asc"
+    if after_id is not None:
+        filters[APPLICATION_ID_FIELD] = f"gt.{after_id}"
+    return supabase_select("applications", filters, columns="id,status", limit=page_size)
+
+def fetch_scan_progress(city, start_date, end_date):
+    """
+    scan_progress tablosundan (city, tarih) için en yüksek bilinen idx'i oku.
+    Tablo yoksa veya hata olursa boş dict döner, tarama idx=1'den başlar.
+    """
+    try:
+        rows = supabase_select_all("scan_progress", {
+            "city": f"eq.{city}",
+            "and": f"(scan_date.gte.{start_date.isoformat()},scan_date.lte.{end_date.isoformat()})"
+        }, columns="scan_date,max_idx", order="scan_date.asc")
+        return {row["scan_date"]: row["max_idx"] for row in rows}
+    except Exception as e:
+        log(f"   ⚠️ Could not load {city} scan progress ({e}), scanning from idx 1", "WARNING")
+        return {}
+
+# ==================================================
+# BACKGROUND DB WRITER
+# ==================================================
+# Selenium döngüleri yazmaları kuyruğa atar, arka plan thread'i biriktirip
+# toplu gönderir. applications önce gönderilir: changes tablosu FK ile bağlı.
+# Status PATCH'leri de changes'tan önce gönderilir (bkz. flush_writes).
+write_queue = queue.Queue()
+UPSERT_CONFLICT_KEYS = {"applications": APPLICATION_ID_FIELD, "scan_progress": "city,scan_date"}
+WRITER_STOP = object()
+
+def queue_insert(table, data):
+    write_queue.put(("insert", table, data))
+
+def queue_update(table, data, match_column, match_value):
+    write_queue.put(("update", table, (data, match_column, match_value)))
+
+def queue_touch(application_id):
+    """Durumu değişmeyen başvurunun last_checked'ini güncelle; writer hepsini tek PATCH'te toplar"""
+    write_queue.put(("touch", "applications", application_id))
+
+def upsert_rows(table, rows):
+    """Toplu upsert; hata loglanır ve False döner"""
+    if not rows:
+        return True
+    log("   💾 Flushing %d %s rows", "DEBUG", len(rows), table)
+    # Tek bir çakışan satır bütün toplu insert'i düşürmesin
     try:
-        result = supabase_select("applications", {APPLICATION_ID_FIELD: f"eq.{application_id}"})
-        exists = len(result) > 0
-        return exists, result[0]["status"] if exists else None
+        supabase_upsert(table, rows, on_conflict=UPSERT_CONFLICT_KEYS[table])
+        return True
     except Exception as e:
-        log(f"DB error for {application_id}: {e}", "ERROR")
-        stats["errors"] += 1
-        return False, None
+        log(f"Upsert exception ({table}): {e}", "ERROR")
+        incr_stat("errors")
+        return False
+
+def flush_writes(inserts, updates, touches, unsaved_app_ids):
+    """unsaved_app_ids: çalıştırma boyunca upsert'i başarısız olan başvuru ID'leri (writer'a ait, partiler arası tutulur)"""
+    # Sıra: applications upsert → status PATCH'leri → changes → scan_progress → last_checked.
+    # Status'u PATCH'lenemeyen (Part 1) veya upsert'i başarısız olan (Part 2) başvurunun changes satırı
+    # yazılmaz: sonraki çalıştırma değişikliği tekrar yakalar ve changes'a tek satır düşer.
+    failed_ids = set()
+    if not upsert_rows("applications", inserts["applications"]):
+        # Bu satırlara bağlı changes kayıtları FK yüzünden zaten reddedilir, partinin kalanını düşürmesinler
+        failed_ids.update(row[APPLICATION_ID_FIELD] for row in inserts["applications"])
+        unsaved_app_ids.update(failed_ids)
+    for table, (data, match_column, match_value) in updates:
+        try:
+            supabase_update(table, data, match_column, match_value)
+        except Exception as e:
+            log(f"Update exception ({table} {match_value}): {e}", "ERROR")
+            incr_stat("errors")
+            failed_ids.add(match_value)
+    changes = [row for row in inserts["changes"] if row["application_id"] not in failed_ids]
+    if changes:
+        log("   💾 Flushing %d changes rows", "DEBUG", len(changes))
+        if not supabase_insert("changes", changes) and len(changes) > 1:
+            # Toplu insert hep-ya-hiç: tek bozuk satır yüzünden diğerleri kaybolmasın
+            log("   Retrying changes rows one by one", "WARNING")
+            for row in changes:
+                supabase_insert("changes", row)
+    # Günün başvurularından biri yazılamadıysa watermark ilerletilmez; sonraki çalıştırma o günü eski yerinden tarar
+    progress = [
+        row for row in inserts["scan_progress"]
+        if not any(app_id.startswith(row["city"] + row["scan_date"].replace("-", "")) for app_id in unsaved_app_ids)
+    ]
+    if len(progress) < len(inserts["scan_progress"]):
+        log(f"   ⚠️ Skipping {len(inserts['scan_progress']) - len(progress)} scan_progress rows with unsaved applications", "WARNING")
+    upsert_rows("scan_progress", progress)
+    if touches:
+        # Partideki tüm satırlar için ortak zaman damgası
+        now = datetime.now(timezone.utc).isoformat()
+        try:
+            supabase_update_in("applications", {"last_checked": now}, APPLICATION_ID_FIELD, touches)
+        except Exception as e:
+            log(f"Update exception (applications last_checked x{len(touches)}): {e}", "ERROR")
+            incr_stat("errors")
+
+def db_writer_loop():
+    inserts = {"applications": [], "changes": [], "scan_progress": []}
+    updates = []
+    touches = []
+    unsaved_app_ids = set()
+    stopping = False
+    while not stopping:
+        try:
+            item = write_queue.get(timeout=WRITE_FLUSH_INTERVAL)
+        except queue.Empty:
+            item = None
+        
+        if item is WRITER_STOP:
+            stopping = True
+        elif item is not None:
+            kind, table, payload = item
+            if kind == "insert":
+                inserts[table].append(payload)
+            elif kind == "touch":
+                touches.append(payload)
+            else:
+                updates.append((table, payload))
+        
+        pending = sum(len(rows) for rows in inserts.values()) + len(updates) + len(touches)
+        if pending and (stopping or item is None or pending >= WRITE_BATCH_SIZE):
+            flush_writes(inserts, updates, touches, unsaved_app_ids)
+            inserts = {table: [] for table in inserts}
+            updates = []
+            touches = []
 
-def is_weekend(date):
-    return date.weekday() >= 5
+def start_db_writer():
+    writer = threading.Thread(target=db_writer_loop, name="db-writer", daemon=True)
+    writer.start()
+    return writer
+
+def stop_db_writer(writer):
+    """Kuyruğu boşalt ve thread'in bitmesini bekle"""
+    write_queue.put(WRITER_STOP)
+    writer.join()
 
 # ==================================================
 # SELENIUM SETUP
@@ -168,29 +487,87 @@ def setup_driver():
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--disable-gpu")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--no-first-run")
+    options.add_argument("--no-default-browser-check")
     options.add_argument("--window-size=1920,1080")
     options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_argument("--blink-settings=imagesEnabled=false")
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
+    # driver.get DOMContentLoaded'da döner; görsel/analytics yüklenmesini beklemez
+    options.page_load_strategy = "eager"
     driver = webdriver.Chrome(options=options)
+    try:
+        # Görsel, font ve analytics isteklerini ağ katmanında engelle
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    except Exception as e:
+        log(f"Could not enable resource blocking: {e}", "WARNING")
     log("Chrome driver ready", "SUCCESS")
     return driver
 
+def start_drivers(count):
+    """
+    Chrome'ları paralel başlat (her biri birkaç saniye sürer).
+    Biri başarısız olursa açılanları kapatıp hatayı yükseltir.
+    """
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        futures = [executor.submit(setup_driver) for _ in range(count)]
+    drivers = []
+    errors = []
+    for future in futures:
+        try:
+            drivers.append(future.result())
+        except Exception as e:
+            errors.append(e)
+    if errors:
+        for driver in drivers:
+            driver.quit()
+        raise errors[0]
+    return drivers
+
 def init_page(driver):
-    """Sayfa ilk yüklemesi ve cookie popup kapatma"""
+    """
+    Sayfa ilk yüklemesi ve cookie popup kapatma.
+    Çerezler bu tarayıcı oturumunda bir kez reddedildiyse popup beklenmez.
+    """
     log(f"Loading page...", "DEBUG")
     driver.get(CHECK_URL)
-    time.sleep(2)
+    driver._page_loaded = True
+    driver._form_elements = None
     try:
-        refuse_btn = WebDriverWait(driver, 3).until(
-            EC.element_to_be_clickable((By.XPATH, "//button[contains(text(),'Refuse all')]"))
+        WebDriverWait(driver, 5).until(
+            EC.presence_of_element_located((By.NAME, "visaApplicationNumber"))
         )
+    except TimeoutException:
+        log("   ⚠️ Application form did not appear after reload", "WARNING")
+    
+    try:
+        if getattr(driver, "_cookies_refused", False):
+            # Consent zaten kayıtlı; popup yine de varsa beklemeden kapat
+            buttons = driver.find_elements(By.XPATH, REFUSE_COOKIES_XPATH)
+            if not buttons:
+                return
+            refuse_btn = buttons[0]
+        else:
+            refuse_btn = WebDriverWait(driver, 3).until(
+                EC.element_to_be_clickable((By.XPATH, REFUSE_COOKIES_XPATH))
+            )
         refuse_btn.click()
+        driver._cookies_refused = True
         log("🍪 Cookie popup dismissed", "DIM")
-        time.sleep(0.5)
+        WebDriverWait(driver, 2).until(
+            EC.invisibility_of_element_located((By.XPATH, REFUSE_COOKIES_XPATH))
+        )
     except:
         pass
 
+def ensure_page(driver):
+    """Driver bu oturumda sayfayı henüz yüklemediyse yükle"""
+    if not getattr(driver, "_page_loaded", False):
+        init_page(driver)
+
 def recover_browser(driver):
     """Browser recovery: refresh page, dismiss cookies, ready for next check"""
     log("   🔧 Recovering browser session...", "WARNING")
@@ -205,6 +582,66 @@ def recover_browser(driver):
 # ==================================================
 # FAST STATUS CHECK - NO PAGE REFRESH
 # ==================================================
+class AdaptiveLimiter:
+    """
+    Site'ye giden kontroller arasında minimum aralık (tüm worker'lar ortak).
+    Hata/stale yanıtta aralık ikiye katlanır, art arda başarılarda tabana iner.
+    Kontrol zaten aralıktan uzun sürüyorsa hiç beklemez.
+    """
+    def __init__(self, min_interval, max_interval, jitter, recover_after):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.recover_after = recover_after
+        self.interval = min_interval
+        self.next_slot = 0.0
+        self.successes = 0
+        self.lock = threading.Lock()
+    
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval + random.uniform(0, self.jitter)
+        if slot > now:
+            time.sleep(slot - now)
+    
+    def record(self, ok):
+        with self.lock:
+            if ok:
+                self.successes += 1
+                if self.successes >= self.recover_after and self.interval > self.min_interval:
+                    self.interval = max(self.min_interval, self.interval / 2)
+                    self.successes = 0
+            else:
+                self.successes = 0
+                if self.interval < self.max_interval:
+                    self.interval = min(self.max_interval, self.interval * 2)
+                    log(f"   🐢 Slowing down: {self.interval:.1f}s between checks", "WARNING")
+
+check_limiter = AdaptiveLimiter(DELAY_BETWEEN_CHECKS, MAX_DELAY_BETWEEN_CHECKS, CHECK_JITTER, LIMITER_RECOVER_AFTER)
+
+def classify_status(result_text):
+    """Alert metnini tek regex taramasıyla status sabitine çevir"""
+    found = {STATUS_MAP[phrase.lower()] for phrase in STATUS_RE.findall(result_text)}
+    return next((status for status in STATUS_PRIORITY if status in found), "UNKNOWN")
+
+def get_alert_text(driver):
+    """Alert metnini tek execute_script çağrısıyla oku; alert yoksa None"""
+    return driver.execute_script(GET_ALERT_TEXT_JS)
+
+def get_form_elements(driver, refresh=False):
+    """Input ve submit butonu driver üzerinde cache'lenir; sayfa yenilenince tekrar bulunur"""
+    cached = getattr(driver, "_form_elements", None)
+    if cached is not None and not refresh:
+        return cached
+    input_box = WebDriverWait(driver, 5).until(
+        EC.presence_of_element_located((By.NAME, "visaApplicationNumber"))
+    )
+    submit_btn = driver.find_element(By.XPATH, SUBMIT_BUTTON_XPATH)
+    driver._form_elements = (input_box, submit_btn)
+    return driver._form_elements
+
 def check_application_status(driver, application_id, is_first_check=False):
     """
     Hızlı kontrol - sayfa yenileme YOK.
@@ -214,31 +651,21 @@ def check_application_status(driver, application_id, is_first_check=False):
         if is_first_check:
             init_page(driver)
         
-        old_alert_text = ""
-        try:
-            old_alert = driver.find_element(By.CSS_SELECTOR, "div.alert__content")
-            old_alert_text = old_alert.text
-        except:
-            pass
-        
-        input_box = WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located((By.NAME, "visaApplicationNumber"))
-        )
-        
-        input_box.click()
-        input_box.send_keys(Keys.CONTROL + "a")
-        input_box.send_keys(Keys.DELETE)
-        time.sleep(0.1)
-        input_box.send_keys(application_id)
+        old_alert_text = get_alert_text(driver) or ""
         
-        submit_btn = driver.find_element(By.XPATH, "//button[@type='submit' and contains(@class,'button__primary')]")
-        submit_btn.click()
+        input_box, submit_btn = get_form_elements(driver)
+        try:
+            driver.execute_script(SET_INPUT_VALUE_JS, input_box, application_id)
+            submit_btn.click()
+        except StaleElementReferenceException:
+            input_box, submit_btn = get_form_elements(driver, refresh=True)
+            driver.execute_script(SET_INPUT_VALUE_JS, input_box, application_id)
+            submit_btn.click()
         
         def alert_changed(driver):
             try:
-                alert = driver.find_element(By.CSS_SELECTOR, "div.alert__content")
-                new_text = alert.text
-                return new_text != old_alert_text and application_id.lower() in new_text.lower()
+                new_text = get_alert_text(driver)
+                return new_text is not None and new_text != old_alert_text and application_id.lower() in new_text.lower()
             except:
                 return False
         
@@ -247,62 +674,42 @@ def check_application_status(driver, application_id, is_first_check=False):
         except TimeoutException:            
             pass
         
-        time.sleep(0.3)  
-        
-        try:
-            result = driver.find_element(By.CSS_SELECTOR, "div.alert__content")
-            result_text = result.text.lower()
-        except:
+        result_text = get_alert_text(driver)
+        if result_text is None:
             log(f"   ⚠️ Alert not found, refreshing page...", "WARNING")
             init_page(driver)
             return "RETRY"
+        result_text = result_text.lower()
         
-        if DEBUG_MODE:
-            if "preliminarily assessed positively" in result_text:
-                log(f"   🔍 [{application_id}]: Approved!", "SUCCESS")
-            elif "was rejected" in result_text:
-                log(f"   🔍 [{application_id}]: Rejected", "ERROR")
-            elif "being processed" in result_text:
-                log(f"   🔍 [{application_id}]: Being Processed", "WARNING")
-            elif "was not found" in result_text or "no application" in result_text or "not found" in result_text:
-                log(f"   🔍 [{application_id}]: Not Found", "DIM")
-            else:
-                log(f"   🔍 [{application_id}]: Unknown", "DEBUG")
+        status = classify_status(result_text)
+        if logger.isEnabledFor(logging.DEBUG):
+            label, level = STATUS_DEBUG_LABELS[status]
+            log("   🔍 [%s]: %s", level, application_id, label)
         
         if application_id.lower() not in result_text:
             log(f"   ⚠️ Stale response, retrying...", "WARNING")
             time.sleep(1)
-            try:
-                result = driver.find_element(By.CSS_SELECTOR, "div.alert__content")
-                result_text = result.text.lower()
-                if application_id.lower() not in result_text:
-                    return "RETRY"
-            except:
+            result_text = (get_alert_text(driver) or "").lower()
+            if application_id.lower() not in result_text:
                 return "RETRY"
+            status = classify_status(result_text)
         
-        if "preliminarily assessed positively" in result_text:
-            return "APPROVED"
-        elif "was rejected" in result_text:
-            return "REJECTED"
-        elif "being processed" in result_text:
-            return "BEING_PROCESSED"
-        elif "was not found" in result_text or "no application" in result_text or "not found" in result_text:
-            return "NOT_FOUND"
-        else:
-            return "UNKNOWN"
+        return status
             
     except Exception as e:
-        stats["errors"] += 1
+        incr_stat("errors")
         log(f"❌ Error: {application_id} - {str(e)[:50]}", "ERROR")
         return "ERROR"
 
 def check_with_retry(driver, application_id, is_first=False, max_retries=2):
     """Retry mekanizması ile kontrol"""
     for attempt in range(max_retries):
+        check_limiter.wait()
         status = check_application_status(driver, application_id, is_first and attempt == 0)
+        check_limiter.record(status not in ("RETRY", "ERROR"))
         if status != "RETRY":
             return status
-        log(f"   🔄 Retry {attempt + 1}/{max_retries} for {application_id}", "DIM")
+        log("   🔄 Retry %d/%d for %s", "DIM", attempt + 1, max_retries, application_id)
         init_page(driver) 
         time.sleep(1)
     return "ERROR"
@@ -310,73 +717,276 @@ def check_with_retry(driver, application_id, is_first=False, max_retries=2):
 # ==================================================
 # PART 1: Check BEING_PROCESSED Applications
 # ==================================================
-def run_part1(driver, is_first=True):
+def check_part1_application(driver, app, position, total):
+    """Tek BEING_PROCESSED kaydını kontrol et; status değiştiyse True döner"""
+    application_id = app[APPLICATION_ID_FIELD]
+    old_status = app["status"]
+    
+    log("[%s/%s] Checking %s...", "INFO", position, total or "?", application_id)
+    
+    new_status = check_with_retry(driver, application_id, is_first=False)
+    incr_stat("checked")
+    
+    if new_status in ["APPROVED", "REJECTED"]:
+        emoji = "✅" if new_status == "APPROVED" else "❌"
+        log("   %s CHANGE: %s → %s", "SUCCESS", emoji, application_id, new_status)
+        now = datetime.now(timezone.utc).isoformat()
+        queue_update("applications", {"status": new_status, "last_checked": now}, 
+                     APPLICATION_ID_FIELD, application_id)
+        queue_insert("changes", {
+            "application_id": application_id,
+            "old_status": old_status,
+            "new_status": new_status,
+            "changed_at": now,
+            "is_read": False
+        })
+        
+        if new_status == "APPROVED":
+            incr_stat("approved")
+        else:
+            incr_stat("rejected")
+        return True
+    elif new_status == "BEING_PROCESSED":
+        queue_touch(application_id)
+    elif new_status == "NOT_FOUND":
+        log(f"   ⚠️ {application_id} not found on website", "WARNING")
+        queue_touch(application_id)
+    return False
+
+def check_part1_shard(driver, shard, total):
+    """Bir worker'ın payına düşen (sıra, kayıt) listesini kendi driver'ı ile sırayla kontrol et"""
+    if not shard:
+        return 0
+    ensure_page(driver)
+    status_changes = 0
+    for position, app in shard:
+        if check_part1_application(driver, app, position, total):
+            status_changes += 1
+    return status_changes
+
+def run_part1(drivers):
     log("=" * 60, "DIM")
     log("📋 PART 1: Checking BEING_PROCESSED applications", "INFO")
     log("─" * 60, "DIM")
     
+    checked_before = datetime.now(timezone.utc) - timedelta(hours=PART1_RECHECK_HOURS)
+    log(f"Fetching BEING_PROCESSED applications not checked in the last {PART1_RECHECK_HOURS}h...", "DEBUG")
     try:
-        log("Fetching BEING_PROCESSED applications from database...", "DEBUG")
-        applications = supabase_select("applications", {"status": "eq.BEING_PROCESSED"})
-        log(f"   Found {len(applications)} applications to check", "INFO")
+        total = supabase_count("applications", being_processed_filters(checked_before))
+        log(f"   Found {total} applications to check", "INFO")
     except Exception as e:
-        log(f"❌ Database error: {e}", "ERROR")
+        log(f"   ⚠️ Could not count BEING_PROCESSED applications: {e}", "WARNING")
+        total = None
+    status_changes = 0
+    idx = 0
+    last_id = None
+    aborted = False
+    
+    # Her sayfa worker sayısı kadar parçaya bölünür; her driver kendi parçasını sırayla kontrol eder
+    with ThreadPoolExecutor(max_workers=len(drivers)) as executor:
+        while True:
+            try:
+                applications = fetch_being_processed_page(checked_before, last_id)
+            except Exception as e:
+                log(f"❌ Database error: {e}", "ERROR")
+                aborted = True
+                break
+            
+            if len(applications) == 0:
+                break
+            log(f"   Fetched page of {len(applications)} applications", "DEBUG")
+            
+            numbered = list(enumerate(applications, idx + 1))
+            shards = [numbered[i::len(drivers)] for i in range(len(drivers))]
+            status_changes += sum(executor.map(check_part1_shard, drivers, shards, [total] * len(drivers)))
+            idx += len(applications)
+            
+            last_id = applications[-1][APPLICATION_ID_FIELD]
+            if len(applications) < PART1_PAGE_SIZE:
+                break
+    
+    if aborted and idx == 0:
+        log("", "DIM")
         return
-
-    if len(applications) == 0:
+    if idx == 0:
         log("No BEING_PROCESSED applications found. Skipping Part 1.", "INFO")
         log("", "DIM")
         return
+    
+    if aborted:
+        log(f"\n   ⚠️ Part 1 aborted after a database error: {idx} checked, {status_changes} changes found", "WARNING")
+    else:
+        log(f"\n   ✓ Part 1 complete: {idx} checked, {status_changes} changes found", "SUCCESS" if status_changes else "DIM")
+    log("", "DIM")
 
-    total = len(applications)
-    status_changes = 0
+# ==================================================
+# PART 2: Discover NEW Applications
+# ==================================================
+def load_city_context(city, start_date, end_date):
+    """Şehrin tarama aralığı için bilinen başvuruları ve kayıtlı ilerlemeyi tek seferde yükle"""
+    city_name = "Ankara" if city == "ANKA" else "Istanbul"
+    log(f"📍 {city_name}", "HIGHLIGHT")
     
-    if is_first:
-        init_page(driver)
+    try:
+        known = fetch_known_applications(city, start_date, end_date)
+        log(f"   {len(known)} known {city} applications loaded", "DEBUG")
+    except Exception as e:
+        log(f"   ⚠️ Could not prefetch known {city} IDs ({e}), falling back to batched lookups", "WARNING")
+        known = None
     
-    for idx, app in enumerate(applications, 1):
-        application_id = app[APPLICATION_ID_FIELD]
-        old_status = app["status"]
+    # Haftanın her günü için görülen en yüksek idx (ID = şehir + YYYYMMDD + NNNN)
+    max_idx_by_weekday = {}
+    for app_id in known or {}:
+        try:
+            weekday = datetime.strptime(app_id[len(city):len(city) + 8], "%Y%m%d").weekday()
+            app_idx = int(app_id[len(city) + 8:])
+        except ValueError:
+            log(f"   Skipping malformed application ID {app_id}", "DEBUG")
+            continue
+        max_idx_by_weekday[weekday] = max(max_idx_by_weekday.get(weekday, 0), app_idx)
+    
+    return {
+        "name": city_name,
+        "name_db": city_name.lower(),
+        "known": known,
+        "progress": fetch_scan_progress(city, start_date, end_date),
+        "max_idx_by_weekday": max_idx_by_weekday,
+        "failed_day_streak": 0,
+        "circuit_open": False,
+        "lock": threading.Lock()
+    }
+
+def scan_day(driver, city, current_date, context):
+    """Tek (şehir, tarih) için ID'leri sırayla dene; bulunan yeni başvuru sayısını döndür"""
+    known = context["known"]
+    date_str = current_date.strftime("%d/%m/%Y")
+    date_prefix = f"{city}{current_date.strftime('%Y%m%d')}"
+    submit_date = current_date.isoformat()
+    log("   [%s] Checking date: %s", "INFO", city, date_str)
+    
+    # Önceki çalıştırmalarda teyit edilen en yüksek idx'ten devam et.
+    # max_idx yalnızca kesin sonuçlu (var / bulundu / NOT_FOUND) kesintisiz aralık boyunca ilerler;
+    # ERROR/UNKNOWN alınan ilk idx'ten sonra sabitlenir ki o idx sonraki çalıştırmada tekrar denensin.
+    saved_max_idx = context["progress"].get(current_date.isoformat(), 0)
+    max_idx = saved_max_idx
+    unresolved = False
+    consecutive_not_found = 0
+    idx = saved_max_idx + 1
+    day_found = 0
+    day_errors = 0
+    day_probes = 0
+    day_known = set()
+    looked_up_to = 0
+    weekday = current_date.weekday()
+    max_idx_by_weekday = context["max_idx_by_weekday"]
+    
+    while True:
+        # Aynı hafta gününde görülen en yoğun günü geçtiysek daha az ardışık not-found yeterli
+        busiest = max_idx_by_weekday.get(weekday)
+        miss_limit = PROBE_TAIL_MISSES if busiest is not None and idx > busiest else MAX_NOT_FOUND_CONSECUTIVE
+        if consecutive_not_found >= miss_limit:
+            break
         
-        log(f"[{idx}/{total}] Checking {application_id}...", "INFO")
+        app_number = date_prefix + str(idx).zfill(4)
         
-        new_status = check_with_retry(driver, application_id, is_first=False)
-        stats["checked"] += 1
-        now = datetime.now(timezone.utc).isoformat()
+        if known is not None:
+            exists = known.get(app_number) is not None
+        else:
+            if idx > looked_up_to:
+                batch = [date_prefix + str(i).zfill(4) for i in range(idx, idx + EXISTS_BATCH_SIZE)]
+                day_known = bulk_exists(batch)
+                looked_up_to = idx + EXISTS_BATCH_SIZE - 1
+            exists = app_number in day_known
+        if exists:
+            if not unresolved:
+                max_idx = idx
+            idx += 1
+            consecutive_not_found = 0
+            continue
         
-        if new_status in ["APPROVED", "REJECTED"]:
-            emoji = "✅" if new_status == "APPROVED" else "❌"
-            log(f"   {emoji} CHANGE: {application_id} → {new_status}", "SUCCESS")
-            supabase_update("applications", {"status": new_status, "last_checked": now}, 
-                          APPLICATION_ID_FIELD, application_id)
-            supabase_insert("changes", {
-                "application_id": application_id,
-                "old_status": old_status,
-                "new_status": new_status,
+        status = check_with_retry(driver, app_number, is_first=False)
+        day_probes += 1
+        incr_stat("checked")
+        
+        if status in ["APPROVED", "REJECTED", "BEING_PROCESSED"]:
+            emoji = "✅" if status == "APPROVED" else "❌" if status == "REJECTED" else "⏳"
+            log("      %s %s → %s", "SUCCESS", emoji, app_number, status)
+            now = datetime.now(timezone.utc).isoformat()
+            
+            queue_insert("applications", {
+                "id": app_number,
+                "city": context["name_db"],
+                "submit_date": submit_date,
+                "status": status,
+                "last_checked": now
+            })
+            if known is not None:
+                known[app_number] = status
+            queue_insert("changes", {
+                "application_id": app_number,
+                "old_status": None,
+                "new_status": status,
                 "changed_at": now,
                 "is_read": False
             })
-            status_changes += 1
             
-            if new_status == "APPROVED":
-                stats["approved"] += 1
-            else:
-                stats["rejected"] += 1
-        elif new_status == "BEING_PROCESSED":
-            supabase_update("applications", {"last_checked": now}, APPLICATION_ID_FIELD, application_id)
-        elif new_status == "NOT_FOUND":
-            log(f"   ⚠️ {application_id} not found on website", "WARNING")
-            supabase_update("applications", {"last_checked": now}, APPLICATION_ID_FIELD, application_id)
+            incr_stat("new_found")
+            if not unresolved:
+                max_idx = idx
+            with context["lock"]:
+                if idx > max_idx_by_weekday.get(weekday, 0):
+                    max_idx_by_weekday[weekday] = idx
+            day_found += 1
+            consecutive_not_found = 0
+        elif status == "NOT_FOUND":
+            consecutive_not_found += 1
+        else:
+            day_errors += 1
+            unresolved = True
+            consecutive_not_found += 1
         
-        time.sleep(DELAY_BETWEEN_CHECKS)
+        idx += 1
     
-    log(f"\n   ✓ Part 1 complete: {status_changes} changes found", "SUCCESS" if status_changes else "DIM")
-    log("", "DIM")
+    if day_found > 0:
+        log("      [%s] %s: +%d new", "DIM", city, date_str, day_found)
+    if max_idx > saved_max_idx:
+        queue_insert("scan_progress", {
+            "city": city,
+            "scan_date": current_date.isoformat(),
+            "max_idx": max_idx
+        })
+    record_day_outcome(city, context, day_found, day_errors, day_probes)
+    return day_found
 
-# ==================================================
-# PART 2: Discover NEW Applications
-# ==================================================
-def run_part2(driver, part2_start_date=None, part2_end_date=None, is_first=True):
+def record_day_outcome(city, context, day_found, day_errors, day_probes):
+    """
+    Şehir bazında devre kesici: hiç bulunamayan ve denemelerinin çoğu hatayla biten ardışık günler
+    eşiği geçerse şehrin kalan (daha eski) günlerini bu çalıştırmada atla. Başarısız sayılmayan her gün seriyi sıfırlar.
+    """
+    failed = day_found == 0 and day_probes > 0 and day_errors >= day_probes * CITY_CIRCUIT_ERROR_RATIO
+    with context["lock"]:
+        if not failed:
+            context["failed_day_streak"] = 0
+        else:
+            context["failed_day_streak"] += 1
+            if context["failed_day_streak"] >= CITY_CIRCUIT_FAILED_DAYS and not context["circuit_open"]:
+                context["circuit_open"] = True
+                log(f"   ⚠️ Circuit open for {city}: {context['failed_day_streak']} days in a row mostly failing, skipping older days", "WARNING")
+
+def scan_worker(driver, work, contexts):
+    """Kuyruktan (şehir, tarih) çiftlerini çekip kendi driver'ı ile tara; şehir bazında yeni sayısı döner"""
+    found = {}
+    while True:
+        try:
+            city, current_date = work.get_nowait()
+        except queue.Empty:
+            return found
+        if contexts[city]["circuit_open"]:
+            continue
+        ensure_page(driver)
+        found[city] = found.get(city, 0) + scan_day(driver, city, current_date, contexts[city])
+
+def run_part2(drivers, part2_start_date=None, part2_end_date=None):
     log("=" * 60, "DIM")
     log("🔎 PART 2: Discovering NEW applications", "INFO")
     log("─" * 60, "DIM")
@@ -386,91 +996,29 @@ def run_part2(driver, part2_start_date=None, part2_end_date=None, is_first=True)
     end_date = part2_end_date if part2_end_date else today
     
     log(f"   Scanning: {start_date.strftime('%d/%m/%Y')} → {end_date.strftime('%d/%m/%Y')}", "INFO")
+    log("", "DIM")
     
     cities = ["ANKA", "ISTA"]
+    contexts = {city: load_city_context(city, start_date, end_date) for city in cities}
+    
+    # Her (şehir, tarih) bağımsız bir iş; driver'lar ortak kuyruktan çeker.
+    # Bir günün içindeki ID denemesi sıralı kalır (ardışık not-found sayacı).
+    # En yeni günler önce: yeni başvurular oradadır, devre kesici açılırsa atlanan günler en eskiler olur.
+    business_days = [d for d in (end_date - timedelta(days=i) for i in range((end_date - start_date).days + 1))
+                     if d.weekday() < 5]
+    work = queue.Queue()
+    for current_date in business_days:
+        for city in cities:
+            work.put((city, current_date))
+    
+    with ThreadPoolExecutor(max_workers=len(drivers)) as executor:
+        results = list(executor.map(scan_worker, drivers, [work] * len(drivers), [contexts] * len(drivers)))
+    
     total_new = 0
-    first_check = is_first
-
-    if first_check:
-        init_page(driver)
-        first_check = False
-
     for city in cities:
-        city_name = "Ankara" if city == "ANKA" else "Istanbul"
-        log("", "DIM")
-        log(f"📍 {city_name}", "HIGHLIGHT")
-        
-        current_date = start_date
-        city_new = 0
-        
-        while current_date <= end_date:
-            if is_weekend(current_date):
-                current_date += timedelta(days=1)
-                continue
-            
-            date_str = current_date.strftime("%d/%m/%Y")
-            log(f"   Checking date: {date_str}", "INFO")
-            
-            consecutive_not_found = 0
-            idx = 1
-            day_found = 0
-            
-            while consecutive_not_found < MAX_NOT_FOUND_CONSECUTIVE:
-                app_number = f"{city}{current_date.strftime('%Y%m%d')}{idx:04d}"
-                
-                exists, existing_status = application_exists(app_number)
-                if exists:
-                    idx += 1
-                    consecutive_not_found = 0
-                    continue
-                
-                status = check_with_retry(driver, app_number, is_first=False)
-                stats["checked"] += 1
-                now = datetime.now(timezone.utc).isoformat()
-                
-                if status in ["APPROVED", "REJECTED", "BEING_PROCESSED"]:
-                    emoji = "✅" if status == "APPROVED" else "❌" if status == "REJECTED" else "⏳"
-                    log(f"      {emoji} {app_number} → {status}", "SUCCESS")
-                    
-                    city_code = app_number[:4] 
-                    city_name_db = "ankara" if city_code == "ANKA" else "istanbul"
-                    submit_date_str = app_number[4:12]  
-                    submit_date = f"{submit_date_str[:4]}-{submit_date_str[4:6]}-{submit_date_str[6:8]}" 
-                    
-                    supabase_insert("applications", {
-                        "id": app_number,
-                        "city": city_name_db,
-                        "submit_date": submit_date,
-                        "status": status,
-                        "last_checked": now
-                    })
-                    supabase_insert("changes", {
-                        "application_id": app_number,
-                        "old_status": None,
-                        "new_status": status,
-                        "changed_at": now,
-                        "is_read": False
-                    })
-                    
-                    stats["new_found"] += 1
-                    day_found += 1
-                    city_new += 1
-                    total_new += 1
-                    consecutive_not_found = 0
-                elif status == "NOT_FOUND":
-                    consecutive_not_found += 1
-                else:
-                    consecutive_not_found += 1
-                
-                idx += 1
-                time.sleep(DELAY_BETWEEN_CHECKS)
-            
-            if day_found > 0:
-                log(f"      {date_str}: +{day_found} new", "DIM")
-            
-            current_date += timedelta(days=1)
-        
-        log(f"      {city_name} total: {city_new} new applications", "INFO")
+        city_new = sum(found.get(city, 0) for found in results)
+        total_new += city_new
+        log(f"      {contexts[city]['name']} total: {city_new} new applications", "INFO")
     
     log(f"\n   ✓ Part 2 complete: {total_new} new applications found", "SUCCESS" if total_new else "DIM")
     log("", "DIM")
@@ -478,6 +1026,17 @@ def run_part2(driver, part2_start_date=None, part2_end_date=None, is_first=True)
 # ==================================================
 # MAIN
 # ==================================================
+def get_check_workers():
+    """CHECK_WORKERS ortam değişkeni; boş veya geçersizse varsayılan CHECK_WORKERS"""
+    raw = (os.getenv("CHECK_WORKERS") or "").strip()
+    if not raw:
+        return CHECK_WORKERS
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        log(f"Invalid CHECK_WORKERS={raw!r}, using {CHECK_WORKERS}", "WARNING")
+        return CHECK_WORKERS
+
 def main():
     if not SUPABASE_URL or not SUPABASE_KEY:
         log("ERROR: SUPABASE_URL and SUPABASE_KEY environment variables must be set!", "ERROR")
@@ -488,29 +1047,35 @@ def main():
     log("=" * 60, "DIM")
     log(f"Debug Mode: {'ON' if DEBUG_MODE else 'OFF'}", "INFO")
     log(f"Started at: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}", "INFO")
+    check_workers = get_check_workers()
+    log(f"Browser workers: {check_workers}", "INFO")
     log("=" * 60, "DIM")
     log("", "DIM")
     
-    driver = None
+    drivers = []
     start_time = time.time()
+    writer = start_db_writer()
     
     try:
-        driver = setup_driver()
+        drivers = start_drivers(check_workers)
         log("", "DIM")
         
-        run_part1(driver, is_first=True)
+        run_part1(drivers)
         
-        run_part2(driver, part2_start_date=None, part2_end_date=None, is_first=False)
+        run_part2(drivers, part2_start_date=None, part2_end_date=None)
         
     except Exception as e:
         log(f"Fatal error: {e}", "ERROR")
         import traceback
+        flush_log()
         traceback.print_exc()
         sys.exit(1)
     finally:
-        if driver:
+        for driver in drivers:
             driver.quit()
-            log("🌐 Browser closed", "DIM")
+        if drivers:
+            log(f"🌐 {len(drivers)} browser(s) closed", "DIM")
+        stop_db_writer(writer)
     
     elapsed = time.time() - start_time
     log("", "DIM")